@@ -1,40 +1,169 @@
+import os
 
+import numpy as np
 
-def day01a(input_path):
-    """Find the number of times the value increases."""
-    with open(input_path) as file_obj:
-        depth_list = [int(line.strip()) for line in file_obj]
+# number of bytes to read from the depth log at a time
+CHUNK_SIZE = 1 << 20
+
+
+def iter_depth_chunks(input_path, chunk_size=CHUNK_SIZE):
+    """Yield the depth values in the input file as numpy int arrays, one chunk
+    at a time, so that the whole log never has to fit in memory.
+    """
+    remainder = b''
+    with open(input_path, 'rb') as file_obj:
+        while True:
+            block = file_obj.read(chunk_size)
+            if not block:
+                break
+            block = remainder + block
+            # hold back any partial line at the end of the block for next time
+            cut = block.rfind(b'\n') + 1
+            remainder = block[cut:]
+            if cut:
+                yield np.array(block[:cut].split(), dtype=np.int64)
+    if remainder.strip():
+        yield np.array(remainder.split(), dtype=np.int64)
+
+
+def iter_increase_flags(input_path, window=1, chunk_size=CHUNK_SIZE):
+    """Yield boolean arrays flagging, for each value in the input file, whether
+    the sum of the `window` values ending there is larger than the sum ending
+    at the value before it.
+
+    The sum increases when the newest value to enter the sliding window is more
+    than the one that is leaving, so compare each value to the one `window`
+    places before it. The last `window` values of each chunk are carried over so
+    that comparisons across chunk boundaries are flagged too. The first `window`
+    values in the file have nothing to compare to and are never flagged.
+    """
+    if window < 1:
+        raise ValueError(f'Window size must be at least 1, got {window}')
+    carry = np.zeros(0, dtype=np.int64)
+    for chunk in iter_depth_chunks(input_path, chunk_size=chunk_size):
+        vals = np.concatenate((carry, chunk))
+        flags = np.zeros(len(chunk), dtype=bool)
+        n_compare = max(len(vals) - window, 0)
+        flags[len(chunk) - n_compare:] = vals[window:] > vals[:-window]
+        carry = vals[-window:]
+        yield flags
+
+
+def count_window_increases(input_path, window=1, chunk_size=CHUNK_SIZE):
+    """Find the number of times the sum of `window` consecutive values increases."""
     counter = 0
-    for ind in range(0, len(depth_list) - 1):
-        if depth_list[ind + 1] > depth_list[ind]:
-            counter += 1
+    for flags in iter_increase_flags(input_path, window, chunk_size):
+        counter += int(np.count_nonzero(flags))
     return counter
 
 
+class IncreaseIndex:
+    """Prefix sums of window increases, so that the number of increases in any
+    range of a depth log can be looked up without rescanning the file.
+
+    prefix[k] is the number of increases flagged at values before index k.
+    """
+
+    def __init__(self, prefix, window):
+        self.prefix = prefix
+        self.window = window
+
+    def __len__(self):
+        """Return the number of depth values in the log."""
+        return len(self.prefix) - 1
+
+    @staticmethod
+    def index_path(input_path, window):
+        """Return the path that the index for this input and window is saved to."""
+        return f'{input_path}.window{window}.npy'
+
+    @classmethod
+    def build(cls, input_path, window=1, chunk_size=CHUNK_SIZE, save=False):
+        """Build the index in a single pass through the file, optionally saving
+        it next to the input file."""
+        pieces = [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for flags in iter_increase_flags(input_path, window, chunk_size):
+            counts = np.cumsum(flags, dtype=np.int64) + total
+            if len(counts):
+                total = counts[-1]
+            pieces.append(counts)
+        prefix = np.concatenate(pieces)
+        if save:
+            np.save(cls.index_path(input_path, window), prefix)
+        return cls(prefix, window)
+
+    @classmethod
+    def load(cls, input_path, window=1, chunk_size=CHUNK_SIZE, save=True):
+        """Load the saved index for this input and window if it is up to date,
+        otherwise build it (and save it, unless told not to).
+
+        The saved prefix sums are memory-mapped, so they are not read into
+        memory until queried.
+        """
+        index_path = cls.index_path(input_path, window)
+        if os.path.exists(index_path) and \
+                os.path.getmtime(index_path) >= os.path.getmtime(input_path):
+            return cls(np.load(index_path, mmap_mode='r'), window)
+        return cls.build(input_path, window, chunk_size, save=save)
+
+    def count(self, start=0, end=None):
+        """Return the number of increases in values [start, end) of the log.
+
+        This is the same answer as running the count on a file holding only
+        those values, so the first `window` values of the range only serve as
+        the start of the first window.
+        """
+        n_vals = len(self)
+        end = n_vals if end is None else min(max(end, 0), n_vals)
+        start = min(max(start, 0) + self.window, end)
+        return int(self.prefix[end] - self.prefix[start])
+
+
+def day01a(input_path):
+    """Find the number of times the value increases."""
+    return count_window_increases(input_path, window=1)
+
+
 def test01a():
     assert 7 == day01a('test_input.txt')
 
 
 def day01b(input_path):
     """Find the number of times the sum of three consecutive values increases."""
-    with open(input_path) as file_obj:
-        depth_list = [int(line.strip()) for line in file_obj]
-    counter = 0
-    for ind in range(0, len(depth_list) - 3):
-        # the sum of three consecutive values increases when the newest value to
-        # enter the sliding window is more than the one that is leaving, so we
-        # don't actually need to sum, I think
-        if depth_list[ind + 3] > depth_list[ind]:
-            counter += 1
-    return counter
+    return count_window_increases(input_path, window=3)
 
 
 def test01b():
     assert 5 == day01b('test_input.txt')
 
 
+def test01_chunks():
+    # tiny chunks so that lines and windows get split across chunk boundaries
+    for chunk_size in [1, 3, 8]:
+        assert 7 == count_window_increases('test_input.txt', 1, chunk_size)
+        assert 5 == count_window_increases('test_input.txt', 3, chunk_size)
+    assert 0 == count_window_increases('test_input.txt', window=10)
+
+
+def test01_index():
+    index = IncreaseIndex.build('test_input.txt', window=3, chunk_size=8)
+    assert 10 == len(index)
+    assert 5 == index.count()
+    assert 5 == index.count(0, 100)
+    # 199, 200, 208, 210, 200 -> window sums 607, 618, 618
+    assert 1 == index.count(0, 5)
+    assert 0 == index.count(1, 6)
+    assert 0 == index.count(7, 3)
+    index = IncreaseIndex.build('test_input.txt', window=1)
+    assert 7 == index.count()
+    assert 3 == index.count(0, 4)
+
+
 if __name__ == '__main__':
     test01a()
     print('Day 01a:', day01a('day01_input.txt'))
     test01b()
     print('Day 01b:', day01b('day01_input.txt'))
+    test01_chunks()
+    test01_index()
@@ -1,3 +1,19 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+
+# opcodes for the commands when they're encoded as numpy arrays
+FORWARD = 0
+DOWN = 1
+UP = 2
+DIRECTIONS = {
+    b'forward': FORWARD,
+    b'down': DOWN,
+    b'up': UP,
+}
+# number of bytes of commands to handle at a time in vectorized mode
+CHUNK_SIZE = 1 << 24
 
 
 def day02a(input_path):
@@ -48,8 +64,192 @@ def test02b():
     assert 900 == day02b('test_input.txt')
 
 
+def parse_commands(data):
+    """Encode a bytes buffer of commands as an int8 array of opcodes and an int
+    array of distances."""
+    tokens = data.split()
+    directions = np.array(tokens[0::2])
+    opcodes = np.full(len(directions), -1, dtype=np.int8)
+    for direction, opcode in DIRECTIONS.items():
+        opcodes[directions == direction] = opcode
+    if np.any(opcodes < 0):
+        raise RuntimeError('Bad direction')
+    distances = np.array(tokens[1::2], dtype=np.int64)
+    return opcodes, distances
+
+
+def read_commands(input_path, start=0, end=None):
+    """Read and encode the commands in bytes [start, end) of the input file."""
+    with open(input_path, 'rb') as file_obj:
+        file_obj.seek(start)
+        data = file_obj.read(-1 if end is None else end - start)
+    return parse_commands(data)
+
+
+def get_chunk_bounds(input_path, chunk_size=CHUNK_SIZE):
+    """Split the input file into (start, end) byte ranges of roughly chunk_size
+    bytes that each begin and end on a line boundary."""
+    size = os.path.getsize(input_path)
+    offsets = [0]
+    with open(input_path, 'rb') as file_obj:
+        while offsets[-1] < size:
+            file_obj.seek(offsets[-1] + chunk_size)
+            file_obj.readline()
+            offsets.append(min(file_obj.tell(), size))
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def get_course_state(opcodes, distances):
+    """Return the (pos, depth, aim) reached by following the encoded commands
+    from (0, 0, 0).
+
+    Aim changes with up and down, and each forward command adds the current aim
+    times the distance to the depth, so the depth is a sum over the forward
+    commands of the cumulative sum of aim. Note that the aim is the same thing
+    as the depth from part a.
+    """
+    forward = opcodes == FORWARD
+    aim_deltas = np.where(opcodes == DOWN, distances, 0) - \
+        np.where(opcodes == UP, distances, 0)
+    aims = np.cumsum(aim_deltas)
+    pos = np.sum(distances[forward])
+    depth = np.sum(aims[forward] * distances[forward])
+    return int(pos), int(depth), int(aims[-1]) if len(aims) else 0
+
+
+def combine_states(state1, state2):
+    """Combine the (pos, depth, aim) of two consecutive stretches of commands.
+
+    The second stretch starts with the aim left by the first one, so every
+    forward distance it covers also picks up that much extra depth.
+    """
+    pos1, depth1, aim1 = state1
+    pos2, depth2, aim2 = state2
+    return pos1 + pos2, depth1 + depth2 + aim1 * pos2, aim1 + aim2
+
+
+def get_chunk_state(args):
+    """Return the course state for one (input_path, start, end) chunk."""
+    return get_course_state(*read_commands(*args))
+
+
+def reduce_course(input_path, n_workers=1, chunk_size=CHUNK_SIZE):
+    """Return the final (pos, depth, aim) for all commands in the input file.
+
+    The file is handled in chunks, and since combining states is associative,
+    the chunks can be handled in any number of worker processes and then
+    combined in order.
+    """
+    chunk_args = [(input_path, start, end)
+                  for start, end in get_chunk_bounds(input_path, chunk_size)]
+    if n_workers == 1:
+        chunk_states = map(get_chunk_state, chunk_args)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            chunk_states = list(executor.map(get_chunk_state, chunk_args))
+    state = (0, 0, 0)
+    for chunk_state in chunk_states:
+        state = combine_states(state, chunk_state)
+    return state
+
+
+def day02a_vectorized(input_path, n_workers=1, chunk_size=CHUNK_SIZE):
+    """Same as day02a, but with numpy arrays instead of string parsing."""
+    pos, _, aim = reduce_course(input_path, n_workers, chunk_size)
+    return aim * pos
+
+
+def day02b_vectorized(input_path, n_workers=1, chunk_size=CHUNK_SIZE):
+    """Same as day02b, but with numpy arrays instead of string parsing."""
+    pos, depth, _ = reduce_course(input_path, n_workers, chunk_size)
+    return depth * pos
+
+
+def get_trajectory(opcodes, distances, state=(0, 0, 0)):
+    """Return an n x 3 array of the (pos, depth, aim) after each of the n
+    encoded commands, starting from the given state."""
+    pos0, depth0, aim0 = state
+    forward_distances = np.where(opcodes == FORWARD, distances, 0)
+    aim_deltas = np.where(opcodes == DOWN, distances, 0) - \
+        np.where(opcodes == UP, distances, 0)
+    trajectory = np.empty((len(opcodes), 3), dtype=np.int64)
+    trajectory[:, 0] = pos0 + np.cumsum(forward_distances)
+    trajectory[:, 2] = aim0 + np.cumsum(aim_deltas)
+    trajectory[:, 1] = depth0 + np.cumsum(trajectory[:, 2] * forward_distances)
+    return trajectory
+
+
+def iter_trajectory(input_path, chunk_size=CHUNK_SIZE):
+    """Yield the (pos, depth, aim) after every command in the input file as a
+    series of n x 3 arrays, one per chunk of the file, so that the whole course
+    never has to fit in memory.
+
+    The last row of the last block is the final state, so day02b's answer
+    comes along for free.
+    """
+    state = (0, 0, 0)
+    for start, end in get_chunk_bounds(input_path, chunk_size):
+        trajectory = get_trajectory(*read_commands(input_path, start, end), state)
+        if len(trajectory):
+            state = tuple(trajectory[-1])
+            yield trajectory
+
+
+def save_trajectory(input_path, output_path, chunk_size=CHUNK_SIZE):
+    """Write the full trajectory to a .npy file one block at a time, and
+    return the final (pos, depth, aim).
+
+    We don't know how many commands there are until we've read them all, so
+    write a header for an empty array first and then fill in the real shape at
+    the end. numpy pads the header so that the shape has room to grow in place.
+    The result can be opened with np.load(output_path, mmap_mode='r').
+    """
+    header = {'descr': np.dtype(np.int64).str, 'fortran_order': False}
+    state = (0, 0, 0)
+    n_commands = 0
+    with open(output_path, 'wb') as file_obj:
+        np.lib.format.write_array_header_1_0(file_obj, {**header, 'shape': (0, 3)})
+        data_offset = file_obj.tell()
+        for trajectory in iter_trajectory(input_path, chunk_size):
+            trajectory.tofile(file_obj)
+            n_commands += len(trajectory)
+            state = tuple(int(val) for val in trajectory[-1])
+        file_obj.seek(0)
+        np.lib.format.write_array_header_1_0(
+            file_obj, {**header, 'shape': (n_commands, 3)})
+        assert file_obj.tell() == data_offset
+    return state
+
+
+def test02_vectorized():
+    assert 150 == day02a_vectorized('test_input.txt')
+    assert 900 == day02b_vectorized('test_input.txt')
+    # tiny chunks so that the states of many chunks need to be combined
+    assert 150 == day02a_vectorized('test_input.txt', n_workers=2, chunk_size=10)
+    assert 900 == day02b_vectorized('test_input.txt', n_workers=2, chunk_size=10)
+
+
+def test02_trajectory():
+    blocks = list(iter_trajectory('test_input.txt', chunk_size=10))
+    trajectory = np.concatenate(blocks)
+    assert trajectory.shape == (6, 3)
+    assert trajectory[2].tolist() == [13, 40, 5]
+    pos, depth, _ = trajectory[-1]
+    assert 900 == depth * pos
+
+    output_path = 'test_trajectory.npy'
+    pos, depth, _ = save_trajectory('test_input.txt', output_path, chunk_size=10)
+    assert 900 == depth * pos
+    saved = np.load(output_path, mmap_mode='r')
+    assert np.array_equal(saved, trajectory)
+    del saved
+    os.remove(output_path)
+
+
 if __name__ == '__main__':
     test02a()
     print('Day 02a:', day02a('day02_input.txt'))
     test02b()
     print('Day 02b:', day02b('day02_input.txt'))
+    test02_vectorized()
+    test02_trajectory()
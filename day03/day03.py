@@ -1,19 +1,45 @@
+import bisect
+
 import numpy as np
 
 
-def load_array(input_path):
-    with open(input_path) as file_obj:
-        bits = [line.strip() for line in file_obj]
-    return np.array([[int(val) for val in row] for row in bits])
+def load_packed(input_path):
+    """Return tuple (packed, width), where packed is an n x ceil(width / 8)
+    uint8 array with the bits of each report packed into one row, most
+    significant bit first.
+    """
+    with open(input_path, 'rb') as file_obj:
+        rows = np.array(file_obj.read().split())
+    width = rows.dtype.itemsize
+    bits = rows.view(np.uint8).reshape(len(rows), width) - ord('0')
+    return np.packbits(bits, axis=1), width
+
+
+def count_ones(packed, width):
+    """Return the number of reports with a 1 in each bit position.
+
+    Instead of unpacking everything, count each of the 8 bit positions within
+    a byte across all of the byte columns at once.
+    """
+    counts = np.zeros(8 * packed.shape[1], dtype=np.int64)
+    for bit in range(8):
+        counts[bit::8] = np.sum((packed >> (7 - bit)) & 1, axis=0)
+    return counts[:width]
+
+
+def packed_to_int(packed_row, width):
+    """Convert a row of packed bits to a python int (which can be as wide as we
+    like)."""
+    return int.from_bytes(packed_row.tobytes(), 'big') >> (8 * len(packed_row) - width)
 
 
 def day03a(input_path):
-    total_array = load_array(input_path)
-    means = np.mean(total_array, axis=0)
-    gamma_ints = np.round(means).astype(np.int32)
-    epsilon_ints = 1 - gamma_ints
-    gamma = np.sum([val * 2**ind for ind, val in enumerate(gamma_ints[::-1])])
-    epsilon = np.sum([val * 2**ind for ind, val in enumerate(epsilon_ints[::-1])])
+    packed, width = load_packed(input_path)
+    counts = count_ones(packed, width)
+    # the most common bit is 1 when more than half of the reports have a 1
+    gamma_bits = 2 * counts > packed.shape[0]
+    gamma = packed_to_int(np.packbits(gamma_bits), width)
+    epsilon = gamma ^ ((1 << width) - 1)
     power = gamma * epsilon
     return power
 
@@ -22,37 +48,115 @@ def test03a():
     assert 198 == day03a('test_input.txt')
 
 
+def test03_packed():
+    packed, width = load_packed('test_input.txt')
+    assert width == 5
+    assert packed_to_int(packed[0], width) == 0b00100
+    assert count_ones(packed, width).tolist() == [7, 5, 8, 7, 5]
+    wide_bits = np.tile([1, 0, 1], 30)
+    assert packed_to_int(np.packbits(wide_bits), 90) == int('101' * 30, 2)
+
+
+def load_sorted_values(input_path):
+    """Return tuple (values, width), where values is a sorted array of the
+    reports as integers.
+
+    Reports up to 64 bits wide go in a uint64 array. Wider ones go in an object
+    array of python ints, which still sorts and compares just fine.
+    """
+    packed, width = load_packed(input_path)
+    n_bytes = packed.shape[1]
+    if width <= 64:
+        # right-align each row in 8 bytes and read it as a big-endian uint64
+        buffer = np.zeros((packed.shape[0], 8), dtype=np.uint8)
+        buffer[:, 8 - n_bytes:] = packed
+        values = buffer.view('>u8').ravel().astype(np.uint64) >> np.uint64(8 * n_bytes - width)
+    else:
+        values = np.array([packed_to_int(row, width) for row in packed], dtype=object)
+    return np.sort(values), width
+
+
+def find_rating(values, width, most_common=True, lo=0, hi=None):
+    """Find the rating among sorted values[lo:hi] by bit criteria.
+
+    Since the values are sorted, all of the values still in the running share
+    the same bits above the current position, and the ones with a 0 at the
+    current position all come before the ones with a 1. So the split between
+    them can be found by bisection, and keeping either group just narrows the
+    [lo, hi) range, without copying anything.
+    """
+    if hi is None:
+        hi = len(values)
+    bit = width - 1
+    while hi - lo > 1 and bit >= 0:
+        prefix = (int(values[lo]) >> (bit + 1)) << (bit + 1)
+        split = bisect.bisect_left(values, prefix | (1 << bit), lo, hi)
+        n_zeros = split - lo
+        n_ones = hi - split
+        # ties go to 1 for the most common value and 0 for the least common
+        keep_ones = n_ones >= n_zeros if most_common else n_ones < n_zeros
+        # if every value has the same bit here, there's nothing to filter out
+        if (keep_ones and n_ones) or not n_zeros:
+            lo = split
+        else:
+            hi = split
+        bit -= 1
+    return int(values[lo])
+
+
 def day03b(input_path):
-    total_array = load_array(input_path)
-    ints = get_value(total_array.copy(), most_common=True)
-    oxygen = np.sum([val * 2**ind for ind, val in enumerate(ints[::-1])])
-    ints = get_value(total_array.copy(), most_common=False)
-    co2 = np.sum([val * 2**ind for ind, val in enumerate(ints[::-1])])
+    values, width = load_sorted_values(input_path)
+    oxygen = find_rating(values, width, most_common=True)
+    co2 = find_rating(values, width, most_common=False)
     return oxygen * co2
 
 
-def get_value(current_array, most_common=True):
-    ind = 0
-    while current_array.shape[0] > 1:
-        mean = np.mean(current_array[:, ind])
-        # python rounds 0.5 to 0 because 0 is even, and I want it to round to 1,
-        # not 0, so use a hack. add 1, get 1.5 to round to 2, then subtract 1.
-        common_val = np.round(mean + 1).astype(np.int32) - 1
-        keep_inds = current_array[:, ind] == common_val
-        if not most_common:
-            keep_inds = np.logical_not(keep_inds)
-        current_array = current_array[keep_inds, :]
-        ind += 1
-    assert current_array.shape[0] == 1
-    return np.squeeze(current_array)
+class ReportLog:
+    """Sorted collection of reports that new reports can be added to, for
+    finding the life support ratings as the reports come in."""
+
+    def __init__(self, width, values=()):
+        self.width = width
+        self.values = sorted(int(val) for val in values)
+
+    def add(self, report):
+        """Add a report, given either as an int or a string of bits."""
+        if isinstance(report, str):
+            report = int(report, 2)
+        bisect.insort(self.values, report)
+
+    @property
+    def oxygen(self):
+        return find_rating(self.values, self.width, most_common=True)
+
+    @property
+    def co2(self):
+        return find_rating(self.values, self.width, most_common=False)
+
+    @property
+    def life_support(self):
+        return self.oxygen * self.co2
 
 
 def test03b():
     assert 230 == day03b('test_input.txt')
 
 
+def test03_sorted():
+    values, width = load_sorted_values('test_input.txt')
+    assert 23 == find_rating(values, width, most_common=True)
+    assert 10 == find_rating(values, width, most_common=False)
+    report_log = ReportLog(width)
+    with open('test_input.txt') as file_obj:
+        for line in file_obj:
+            report_log.add(line.strip())
+    assert 230 == report_log.life_support
+
+
 if __name__ == '__main__':
     test03a()
     print('Day 03a:', day03a('day03_input.txt'))
     test03b()
     print('Day 03b:', day03b('day03_input.txt'))
+    test03_packed()
+    test03_sorted()
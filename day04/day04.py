@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 import numpy as np
 
 
@@ -72,7 +74,7 @@ def test04b():
     assert 1924 == score
 
 
-def load_input(input_path):
+def load_input(input_path, size=5):
     with open(input_path) as file_obj:
         number_list = [int(val) for val in file_obj.readline().strip().split(',')]
         lines = [line.strip() for line in file_obj]
@@ -84,15 +86,142 @@ def load_input(input_path):
             continue
         board_input.append([int(val) for val in line.split()])
         count += 1
-        if count == 5:
+        if count == size:
             board_list.append(BingoBoard(board_input))
             count = 0
             board_input = []
     return number_list, board_list
 
 
+def load_boards(input_path):
+    """Return tuple (numbers, boards), where numbers is an array of the drawn
+    numbers in order and boards is an n_boards x size x size array.
+
+    Board size is taken from the number of values on the first board line.
+    """
+    with open(input_path) as file_obj:
+        numbers = np.array(file_obj.readline().strip().split(','), dtype=np.int64)
+        data = file_obj.read()
+    size = len(data.strip().split('\n', 1)[0].split())
+    boards = np.array(data.split(), dtype=np.int64).reshape(-1, size, size)
+    return numbers, boards
+
+
+def get_win_turns(numbers, boards):
+    """Return tuple (win_turns, call_turns).
+
+    call_turns has the same shape as boards and holds the turn (index into
+    numbers) at which each value gets called. A line is complete at the max
+    turn of its values, and a board wins at the earliest of those over all of
+    its rows and columns. Values that are never called, and boards that never
+    win, get a turn of len(numbers).
+    """
+    n_numbers = len(numbers)
+    lookup = np.full(max(numbers.max(), boards.max()) + 1, n_numbers, dtype=np.int64)
+    # assign in reverse so that repeated numbers keep their first turn
+    lookup[numbers[::-1]] = np.arange(n_numbers)[::-1]
+    call_turns = lookup[boards]
+    row_turns = call_turns.max(axis=2).min(axis=1)
+    col_turns = call_turns.max(axis=1).min(axis=1)
+    return np.minimum(row_turns, col_turns), call_turns
+
+
+def get_board_score(numbers, boards, win_turns, call_turns, board_ind):
+    """Return the score for a board at the turn it wins."""
+    win_turn = win_turns[board_ind]
+    if win_turn == len(numbers):
+        raise RuntimeError(f'Board {board_ind} never gets bingo')
+    unmarked = call_turns[board_ind] > win_turn
+    return int(np.sum(boards[board_ind][unmarked]) * numbers[win_turn])
+
+
+def day04a_vectorized(input_path):
+    """Return the score for the first board to get bingo, for all boards at once."""
+    numbers, boards = load_boards(input_path)
+    win_turns, call_turns = get_win_turns(numbers, boards)
+    board_ind = np.argmin(win_turns)
+    return get_board_score(numbers, boards, win_turns, call_turns, board_ind)
+
+
+def day04b_vectorized(input_path):
+    """Return the score for the last board to get bingo, for all boards at once."""
+    numbers, boards = load_boards(input_path)
+    win_turns, call_turns = get_win_turns(numbers, boards)
+    board_ind = np.argmax(win_turns)
+    return get_board_score(numbers, boards, win_turns, call_turns, board_ind)
+
+
+def test04_vectorized():
+    numbers, boards = load_boards('test_input.txt')
+    assert boards.shape == (3, 5, 5)
+    win_turns, _ = get_win_turns(numbers, boards)
+    assert win_turns.tolist() == [13, 14, 11]
+    assert 4512 == day04a_vectorized('test_input.txt')
+    assert 1924 == day04b_vectorized('test_input.txt')
+
+
+class BingoCaller:
+    """Check numbers against all boards as they're called, one at a time.
+
+    Keep an index from each number to where it shows up on the boards, so that
+    calling a number only touches the spots that hold it, plus hit counts for
+    every row and column and the sum of unmarked numbers for every board.
+    """
+
+    def __init__(self, boards):
+        """Initialize BingoCaller.
+
+        :param boards: n_boards x size x size array of board numbers
+        """
+        self.boards = np.asarray(boards)
+        n_boards, self.size, _ = self.boards.shape
+        self.locations = defaultdict(list)
+        for board_ind, irow, icol in zip(*np.indices(self.boards.shape).reshape(3, -1)):
+            val = self.boards[board_ind, irow, icol]
+            self.locations[int(val)].append((int(board_ind), int(irow), int(icol)))
+        self.hits = np.zeros(self.boards.shape, dtype=bool)
+        self.row_hits = np.zeros((n_boards, self.size), dtype=np.int64)
+        self.col_hits = np.zeros((n_boards, self.size), dtype=np.int64)
+        self.unmarked_sums = self.boards.sum(axis=(1, 2)).astype(np.int64)
+        self.done = np.zeros(n_boards, dtype=bool)
+
+    def call(self, val):
+        """Mark a number on every board that's still in play.
+
+        Return a list of (board index, score) tuples for boards that got bingo
+        with this number.
+        """
+        winners = []
+        for board_ind, irow, icol in self.locations.get(val, []):
+            if self.done[board_ind] or self.hits[board_ind, irow, icol]:
+                continue
+            self.hits[board_ind, irow, icol] = True
+            self.unmarked_sums[board_ind] -= val
+            self.row_hits[board_ind, irow] += 1
+            self.col_hits[board_ind, icol] += 1
+            if self.row_hits[board_ind, irow] == self.size or \
+                    self.col_hits[board_ind, icol] == self.size:
+                self.done[board_ind] = True
+                winners.append((board_ind, int(self.unmarked_sums[board_ind]) * val))
+        return winners
+
+
+def test04_caller():
+    numbers, boards = load_boards('test_input.txt')
+    caller = BingoCaller(boards)
+    winners = []
+    for val in numbers:
+        winners.extend(caller.call(int(val)))
+    assert [board_ind for board_ind, _ in winners] == [2, 0, 1]
+    assert 4512 == winners[0][1]
+    assert 1924 == winners[-1][1]
+    assert all(caller.done)
+
+
 if __name__ == '__main__':
     test04a()
     print('Day 04a:', day04a('day04_input.txt'))
     test04b()
     print('Day 04b:', day04b('day04_input.txt'))
+    test04_vectorized()
+    test04_caller()
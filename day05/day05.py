@@ -1,28 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
 import numpy as np
 
 
-def day05(input_path, part_a=True):
+# the dense grid is only used if it has at most this many cells per line point
+DENSE_CELLS_PER_POINT = 16
+# and it's never allowed to get bigger than this many cells
+MAX_DENSE_CELLS = 1 << 26
+# number of bands per worker when filling the grid in parallel
+BANDS_PER_WORKER = 4
+
+
+def day05(input_path, part_a=True, mode='auto', n_workers=None):
     """Count the overlappint points for all valid lines.
 
     For part a, only horizontal and vertical lines are valid. For part b,
     45-degree diagonal lines are valid as well.
+
+    Overlaps are counted on a dense grid ('dense'), by sorting the points
+    ('sparse'), or on a dense grid filled in horizontal bands by a pool of
+    n_workers processes ('parallel'). The default ('auto') picks the dense grid
+    unless the bounding box of the lines is much bigger than the number of
+    points they cover.
     """
-    points1, points2 = load_input(input_path)
-    max_vals = np.max(np.vstack([points1, points2]), axis=0)
-    grid = np.zeros((max_vals + 1), dtype=np.int)
-
-    for p1, p2 in zip(points1, points2):
-        if (p1[0] != p2[0]) and (p1[1] != p2[1]) and part_a:
-            continue
-        # we should probably check to verify that any diagonal lines are
-        # 45-degree diagonal lines, but I guess they all are, because I got the
-        # right answer without checking.
-        delta = p2 - p1
-        for ind in range(np.max(np.abs(delta)) + 1):
-            x_ind = p1[0] + ind * np.sign(delta[0])
-            y_ind = p1[1] + ind * np.sign(delta[1])
-            grid[y_ind, x_ind] += 1
-    return np.sum(grid >= 2)
+    points1, points2 = filter_lines(*load_input(input_path), part_a=part_a)
+    if not len(points1):
+        return 0
+    if mode == 'parallel':
+        return count_overlaps_parallel(points1, points2, n_workers=n_workers)
+    x_vals, y_vals = rasterize(points1, points2)
+    if mode == 'auto':
+        mode = choose_mode(points1, points2, len(x_vals))
+    if mode == 'dense':
+        return count_overlaps_dense(x_vals, y_vals)
+    if mode == 'sparse':
+        return count_overlaps_sparse(x_vals, y_vals)
+    raise ValueError(f'Unknown mode {mode}')
+
+
+def choose_mode(points1, points2, n_points):
+    """Return 'dense' if a grid covering the bounding box of the lines is small
+    enough, and 'sparse' if not."""
+    all_points = np.vstack([points1, points2])
+    n_cells = np.prod(np.ptp(all_points, axis=0) + 1, dtype=np.float64)
+    if n_cells <= min(DENSE_CELLS_PER_POINT * n_points, MAX_DENSE_CELLS):
+        return 'dense'
+    return 'sparse'
+
+
+def get_keys(x_vals, y_vals):
+    """Return an int64 key for each point, its index into the flattened grid
+    covering the bounding box of the points."""
+    x_vals = x_vals - np.min(x_vals)
+    y_vals = y_vals - np.min(y_vals)
+    return y_vals.astype(np.int64) * (np.max(x_vals) + 1) + x_vals
+
+
+def count_overlaps_dense(x_vals, y_vals):
+    """Count points covered at least twice by counting lines for every cell in
+    the grid."""
+    counts = np.bincount(get_keys(x_vals, y_vals))
+    return np.sum(counts >= 2)
+
+
+def count_overlaps_sparse(x_vals, y_vals):
+    """Count points covered at least twice without allocating a grid.
+
+    After sorting, repeated points end up next to each other, so count the
+    number of runs of repeated keys.
+    """
+    keys = np.sort(get_keys(x_vals, y_vals))
+    repeats = keys[1:] == keys[:-1]
+    if not len(repeats):
+        return 0
+    return int(repeats[0]) + np.count_nonzero(repeats[1:] & ~repeats[:-1])
+
+
+def count_overlaps_parallel(points1, points2, n_workers=None):
+    """Count points covered at least twice on a dense grid in shared memory.
+
+    The grid is split into horizontal bands, and each band gets the parts of
+    the lines that cross it. Bands are filled and counted by a process pool,
+    and since no two bands share any rows, the workers can all write into the
+    same grid without stepping on each other.
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    all_points = np.vstack([points1, points2])
+    min_vals = np.min(all_points, axis=0)
+    points1 = points1 - min_vals
+    points2 = points2 - min_vals
+    n_cols, n_rows = np.max(all_points, axis=0) - min_vals + 1
+    grid_shape = (int(n_rows), int(n_cols))
+    dtype = np.dtype(np.int32)
+    band_rows = -(-n_rows // (n_workers * BANDS_PER_WORKER))
+
+    shm = shared_memory.SharedMemory(create=True, size=int(n_rows * n_cols) * dtype.itemsize)
+    try:
+        band_args = []
+        for row0 in range(0, n_rows, band_rows):
+            row1 = min(row0 + band_rows, n_rows)
+            band_points1, band_points2 = clip_lines(points1, points2, row0, row1)
+            band_args.append((shm.name, grid_shape, dtype, row0, row1,
+                              band_points1, band_points2))
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return sum(executor.map(fill_band, band_args))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def clip_lines(points1, points2, row0, row1):
+    """Return the (points1, points2) for the parts of the lines that fall in
+    rows [row0, row1), leaving out lines that don't cross those rows at all."""
+    delta = points2 - points1
+    signs = np.sign(delta)
+    last_steps = np.max(np.abs(delta), axis=1)
+    y_start = points1[:, 1]
+    y_sign = signs[:, 1]
+    # range of steps along each line that keeps y within the band
+    step_lo = np.where(y_sign > 0, row0 - y_start, y_start - (row1 - 1))
+    step_hi = np.where(y_sign > 0, row1 - 1 - y_start, y_start - row0)
+    flat = y_sign == 0
+    in_band = (y_start >= row0) & (y_start < row1)
+    step_lo = np.where(flat, np.where(in_band, 0, 1), np.maximum(step_lo, 0))
+    step_hi = np.where(flat, np.where(in_band, last_steps, 0),
+                       np.minimum(step_hi, last_steps))
+    keep = step_lo <= step_hi
+    new_points1 = points1[keep] + step_lo[keep, None] * signs[keep]
+    new_points2 = points1[keep] + step_hi[keep, None] * signs[keep]
+    return new_points1, new_points2
+
+
+def fill_band(args):
+    """Add the lines for one band into the shared grid, and return the number
+    of points in the band that are covered at least twice."""
+    shm_name, grid_shape, dtype, row0, row1, points1, points2 = args
+    if not len(points1):
+        return 0
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        grid = np.ndarray(grid_shape, dtype=dtype, buffer=shm.buf)
+        band = grid[row0:row1]
+        x_vals, y_vals = rasterize(points1, points2)
+        keys = (y_vals - row0) * grid_shape[1] + x_vals
+        band += np.bincount(keys, minlength=band.size).reshape(band.shape).astype(dtype)
+        n_overlaps = int(np.sum(band >= 2))
+        del grid, band
+        return n_overlaps
+    finally:
+        shm.close()
+
+
+def filter_lines(points1, points2, part_a=True):
+    """Return tuple (points1, points2) with only the valid lines.
+
+    All lines have to be horizontal, vertical, or 45-degree diagonal, and for
+    part a, the diagonal ones are left out.
+    """
+    delta = points2 - points1
+    straight = np.any(delta == 0, axis=1)
+    keep = straight if part_a else np.ones_like(straight)
+    diagonal = np.abs(delta[:, 0]) == np.abs(delta[:, 1])
+    bad_inds = np.where(keep & ~straight & ~diagonal)[0]
+    if len(bad_inds):
+        ind = bad_inds[0]
+        raise RuntimeError(f'Line from {points1[ind]} to {points2[ind]} is not '
+                           'horizontal, vertical, or a 45-degree diagonal')
+    return points1[keep], points2[keep]
+
+
+def rasterize(points1, points2):
+    """Return tuple (x_vals, y_vals) of arrays with the coordinates of every
+    point on every line, all generated at once.
+
+    Each line covers max(|dx|, |dy|) + 1 points, and the nth point is the start
+    point plus n steps in the direction of the sign of the delta.
+    """
+    delta = points2 - points1
+    signs = np.sign(delta)
+    lengths = np.max(np.abs(delta), axis=1) + 1
+    line_inds = np.repeat(np.arange(len(lengths)), lengths)
+    # step count along its own line for every point
+    steps = np.arange(np.sum(lengths)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    x_vals = points1[line_inds, 0] + steps * signs[line_inds, 0]
+    y_vals = points1[line_inds, 1] + steps * signs[line_inds, 1]
+    return x_vals, y_vals
 
 
 def load_input(input_path):
@@ -47,6 +212,17 @@ def test05a():
     assert 5 == score
 
 
+def test05_rasterize():
+    x_vals, y_vals = rasterize(np.array([[0, 9], [8, 0]]), np.array([[2, 9], [5, 3]]))
+    assert x_vals.tolist() == [0, 1, 2, 8, 7, 6, 5]
+    assert y_vals.tolist() == [9, 9, 9, 0, 1, 2, 3]
+    try:
+        filter_lines(np.array([[0, 0]]), np.array([[1, 2]]), part_a=False)
+        assert False, 'Expected error for line that is not 45 degrees'
+    except RuntimeError:
+        pass
+
+
 def day05b(input_path):
     return day05(input_path, part_a=False)
 
@@ -56,8 +232,16 @@ def test05b():
     assert 12 == score
 
 
+def test05_modes():
+    for mode in ['dense', 'sparse', 'parallel']:
+        assert 5 == day05('test_input.txt', part_a=True, mode=mode)
+        assert 12 == day05('test_input.txt', part_a=False, mode=mode)
+
+
 if __name__ == '__main__':
     test05a()
     print('Day 05a:', day05a('day05_input.txt'))
     test05b()
     print('Day 05b:', day05b('day05_input.txt'))
+    test05_rasterize()
+    test05_modes()
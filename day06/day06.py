@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 
 
@@ -30,6 +32,120 @@ def day06(input_path, n_days=80):
     return sum([val for val in counts.values()])
 
 
+def load_timers(input_path, newborn_timer=8):
+    """Return the number of fish at each timer value, 0 to newborn_timer."""
+    with open(input_path) as file_obj:
+        vals = np.array(file_obj.readline().strip().split(','), dtype=np.int64)
+    if np.any(vals > newborn_timer) or np.any(vals < 0):
+        raise RuntimeError(f'Timer values must be from 0 to {newborn_timer}')
+    return np.bincount(vals, minlength=newborn_timer + 1).astype(object)
+
+
+def get_transition_matrix(reset_timer=6, newborn_timer=8):
+    """Return the matrix that takes the fish counts at each timer value from one
+    day to the next.
+
+    Fish at timer n move to n-1, and the fish at 0 go back to reset_timer and
+    each add a new fish at newborn_timer. Entries are python ints (in an object
+    array) so that the counts never overflow.
+    """
+    if not 0 <= reset_timer <= newborn_timer:
+        raise ValueError('Reset timer must be between 0 and the newborn timer')
+    size = newborn_timer + 1
+    matrix = np.zeros((size, size), dtype=object)
+    for ind in range(newborn_timer):
+        matrix[ind, ind + 1] = 1
+    matrix[reset_timer, 0] += 1
+    matrix[newborn_timer, 0] += 1
+    return matrix
+
+
+def matrix_power(matrix, power):
+    """Raise a square matrix to a non-negative integer power by repeated squaring."""
+    if power < 0:
+        raise ValueError(f'Power must be non-negative, got {power}')
+    result = np.identity(matrix.shape[0], dtype=object)
+    while power:
+        if power & 1:
+            result = result @ matrix
+        matrix = matrix @ matrix
+        power >>= 1
+    return result
+
+
+def project_population(counts, n_days, reset_timer=6, newborn_timer=8):
+    """Return the number of fish after n days, starting from the number of fish
+    at each timer value, in O(log n) matrix products."""
+    matrix = get_transition_matrix(reset_timer, newborn_timer)
+    return int(np.sum(matrix_power(matrix, n_days) @ counts))
+
+
+def day06_projected(input_path, n_days=80, reset_timer=6, newborn_timer=8):
+    """Calculate lanternfish population after n days, with a matrix power
+    instead of stepping through every day."""
+    counts = load_timers(input_path, newborn_timer)
+    return project_population(counts, n_days, reset_timer, newborn_timer)
+
+
+@functools.lru_cache(maxsize=None)
+def get_contribution_table(horizons, reset_timer=6, newborn_timer=8):
+    """Return a (newborn_timer + 1) x len(horizons) table of the number of fish
+    that a single fish starting at each timer value turns into after each
+    number of days in horizons (a tuple, so that the table can be cached).
+
+    The population from one fish at timer t after n days is the sum of column t
+    of the transition matrix to the nth power. Go through the horizons in order
+    so that each matrix power builds on the last one.
+    """
+    matrix = get_transition_matrix(reset_timer, newborn_timer)
+    table = np.zeros((newborn_timer + 1, len(horizons)), dtype=object)
+    power = np.identity(newborn_timer + 1, dtype=object)
+    last_n_days = 0
+    for ind in sorted(range(len(horizons)), key=lambda ind: horizons[ind]):
+        power = matrix_power(matrix, horizons[ind] - last_n_days) @ power
+        last_n_days = horizons[ind]
+        table[:, ind] = np.sum(power, axis=0)
+    return table
+
+
+def project_schools(schools, horizons, reset_timer=6, newborn_timer=8):
+    """Return a len(schools) x len(horizons) array of the number of fish in
+    each school after each number of days.
+
+    Schools can be given as input file paths or as counts of fish at each timer
+    value. Each school's populations are just its counts dotted with the
+    (cached) contribution table.
+    """
+    counts = []
+    for school in schools:
+        if isinstance(school, str):
+            school = load_timers(school, newborn_timer)
+        counts.append(np.asarray(school, dtype=object))
+    table = get_contribution_table(tuple(horizons), reset_timer, newborn_timer)
+    return np.array(counts, dtype=object).reshape(-1, newborn_timer + 1) @ table
+
+
+def test06_projected():
+    assert 5934 == day06_projected('test_input.txt')
+    assert 26984457539 == day06_projected('test_input.txt', n_days=256)
+    for n_days in [0, 1, 18, 100]:
+        assert day06('test_input.txt', n_days) == day06_projected('test_input.txt', n_days)
+    # compare a different reproduction cycle against simulating every fish
+    fish = [3, 4, 3, 1, 2]
+    for _ in range(30):
+        n_new = fish.count(0)
+        fish = [4 if val == 0 else val - 1 for val in fish] + n_new * [5]
+    assert len(fish) == day06_projected('test_input.txt', 30, reset_timer=4,
+                                        newborn_timer=5)
+    # huge horizons are fine too, with exact integers
+    assert day06_projected('test_input.txt', 10**5) > 2**64
+    try:
+        day06_projected('test_input.txt', -1)
+        assert False, 'Expected error for negative number of days'
+    except ValueError:
+        pass
+
+
 def test06a():
     score = day06('test_input.txt')
     assert 5934 == score
@@ -40,8 +156,19 @@ def test06b():
     assert 26984457539 == score
 
 
+def test06_schools():
+    results = project_schools(['test_input.txt', [0, 1, 0, 0, 0, 0, 0, 0, 0]],
+                              [256, 18, 80])
+    assert results.shape == (2, 3)
+    assert results[0].tolist() == [26984457539, 26, 5934]
+    # a single fish with timer 1 has 7 fish after 18 days
+    assert results[1, 1] == 7
+
+
 if __name__ == '__main__':
     test06a()
     print('Day 06a:', day06('day06_input.txt'))
     test06b()
     print('Day 06b:', day06('day06_input.txt', n_days=256))
+    test06_projected()
+    test06_schools()
@@ -57,8 +57,169 @@ def test07b():
     assert 168 == score
 
 
+def load_positions(input_path):
+    """Return an int array of crab positions."""
+    with open(input_path) as file_obj:
+        return np.fromstring(file_obj.readline(), dtype=np.int64, sep=',')
+
+
+def get_triangular_costs(vals):
+    """Return tuple (positions, costs) with the exact total fuel for aligning
+    at every position from the min to the max crab position.
+
+    Moving d steps costs the triangular number d * (d + 1) / 2. Split the crabs
+    into the ones at or left of each position and the ones to the right, and
+    the total for each side only depends on the number of crabs and the sums
+    of their positions and squared positions. Those come from prefix sums over
+    a histogram of positions, so every position costs O(1).
+    """
+    min_val = np.min(vals)
+    counts = np.bincount(vals - min_val)
+    positions = np.arange(len(counts), dtype=np.int64)
+    # number, sum and sum of squares of positions for crabs at or to the left
+    left0 = np.cumsum(counts)
+    left1 = np.cumsum(counts * positions)
+    left2 = np.cumsum(counts * positions**2)
+    right0 = left0[-1] - left0
+    right1 = left1[-1] - left1
+    right2 = left2[-1] - left2
+    # sum of (x - p)^2 + (x - p) over the left, and (p - x)^2 + (p - x) over the right
+    x = positions
+    left_costs = left0 * x**2 - 2 * x * left1 + left2 + left0 * x - left1
+    right_costs = right2 - 2 * x * right1 + right0 * x**2 + right1 - right0 * x
+    return positions + min_val, (left_costs + right_costs) // 2
+
+
+def day07b_exact(input_path):
+    """Same as day07b, but try every position, with closed-form costs."""
+    vals = load_positions(input_path)
+    _, costs = get_triangular_costs(vals)
+    return int(np.min(costs))
+
+
+def test07b_exact():
+    positions, costs = get_triangular_costs(load_positions('test_input.txt'))
+    assert positions[np.argmin(costs)] == 5
+    # 2 and 5 are the examples from the puzzle
+    assert costs[2] == 206
+    assert costs[5] == 168
+    assert 168 == day07b_exact('test_input.txt')
+
+
+def capped_cost(cap):
+    """Return a cost function that is linear in distance up to cap and flat
+    after that.
+
+    Totals of capped costs aren't convex in position, so align finds their
+    minimum on the full cost curve instead of searching for it.
+    """
+    return lambda dists: np.minimum(dists, cap)
+
+
+# built-in fuel costs as a function of (an array of) distance moved
+COST_FUNCTIONS = {
+    'linear': lambda dists: dists,
+    'triangular': lambda dists: dists * (dists + 1) // 2,
+    'quadratic': lambda dists: dists**2,
+}
+# built-in fuel costs that need a cap, as functions that build the cost function
+CAPPED_COST_FUNCTIONS = {
+    'capped': capped_cost,
+}
+
+
+def get_cost_function(cost, cap=None):
+    """Return the cost function for a built-in cost name, or the cost itself if
+    it's already a function."""
+    if cost in CAPPED_COST_FUNCTIONS:
+        if cap is None:
+            raise ValueError(f'The {cost} cost needs a cap')
+        return CAPPED_COST_FUNCTIONS[cost](cap)
+    if isinstance(cost, str):
+        return COST_FUNCTIONS[cost]
+    return cost
+
+
+def align(vals, cost='linear', cap=None, return_curve=False):
+    """Find the position that takes the least total fuel to align all crabs.
+
+    :param vals: array of crab positions
+    :param cost: name of a built-in cost in COST_FUNCTIONS or
+        CAPPED_COST_FUNCTIONS, or a function that takes an array of distances
+        and returns an array of costs
+    :param cap: distance after which the cost stops growing, for capped costs
+    :param return_curve: if True, also return the total cost at every position
+        from the min to the max crab position
+    :return: tuple (position, total_cost), or (position, total_cost, positions,
+        costs) with the cost curve
+
+    If the cost is convex in (signed) distance, the total cost is convex in
+    position, so search with integer ternary search over the range of
+    positions. Every total is computed over a histogram of crab positions, so
+    it's one vectorized sum no matter how many crabs there are. If the cost
+    isn't convex (like a capped cost), the search could get stuck in a local
+    minimum, so take the minimum of the whole cost curve instead.
+    """
+    cost_fn = get_cost_function(cost, cap)
+    min_val = np.min(vals)
+    counts = np.bincount(vals - min_val)
+    n_positions = len(counts)
+    offsets = np.arange(n_positions, dtype=np.int64)
+    # cost of every possible signed distance between a crab and a position
+    dist_costs = cost_fn(np.abs(np.arange(-(n_positions - 1), n_positions)))
+    is_convex = np.all(np.diff(dist_costs, 2) >= 0)
+
+    def total_cost(position):
+        return int(np.sum(counts * cost_fn(np.abs(offsets - position))))
+
+    costs = None
+    if return_curve or not is_convex:
+        # the cost curve is the histogram convolved with the cost of every
+        # possible signed distance, so compute it all in one go
+        costs = np.convolve(counts, dist_costs)[n_positions - 1:2 * n_positions - 1]
+
+    if is_convex:
+        lo = 0
+        hi = n_positions - 1
+        while hi - lo > 2:
+            mid1 = lo + (hi - lo) // 3
+            mid2 = hi - (hi - lo) // 3
+            if total_cost(mid1) <= total_cost(mid2):
+                hi = mid2
+            else:
+                lo = mid1 + 1
+        best = min(range(lo, hi + 1), key=total_cost)
+    else:
+        best = int(np.argmin(costs))
+    result = (int(best + min_val), total_cost(best))
+    if return_curve:
+        return result + (offsets + min_val, costs)
+    return result
+
+
+def test07_align():
+    vals = load_positions('test_input.txt')
+    assert (2, 37) == align(vals)
+    assert (5, 168) == align(vals, 'triangular')
+    _, quadratic_cost = align(vals, 'quadratic')
+    assert quadratic_cost == min(np.sum((vals - pos)**2) for pos in range(17))
+    assert (5, 168) == align(vals, lambda dists: dists * (dists + 1) // 2)
+    position, total, positions, costs = align(vals, capped_cost(3), return_curve=True)
+    assert costs[position - positions[0]] == total == np.min(costs)
+    _, triangular_costs = get_triangular_costs(vals)
+    assert align(vals, 'triangular', return_curve=True)[3].tolist() == \
+        triangular_costs.tolist()
+    # ternary search would stop at the local minimum of 12 at position 24
+    vals = np.array([24, 34, 6, 36])
+    position, total, _, costs = align(vals, 'capped', cap=4, return_curve=True)
+    assert total == np.min(costs) == 10
+    assert (position, total) == align(vals, capped_cost(4))
+
+
 if __name__ == '__main__':
     test07a()
     print('Day 07a:', day07a('day07_input.txt'))
     test07b()
     print('Day 07b:', day07b('day07_input.txt'))
+    test07b_exact()
+    test07_align()
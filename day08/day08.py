@@ -1,6 +1,15 @@
+import functools
+import itertools
 
+import numpy as np
 
-def load_input(input_path):
+
+def load_input(input_path, as_masks=False):
+    """Return lists of the ten patterns and four output patterns for each
+    display, with each pattern as a set of segment letters, or as a 7-bit int
+    mask (bit 0 for 'a' through bit 6 for 'g') if as_masks is True.
+    """
+    convert = pattern_to_mask if as_masks else set
     lines = []
     with open(input_path) as file_obj:
         for line in file_obj:
@@ -11,18 +20,26 @@ def load_input(input_path):
     ind = 0
     while ind < len(lines):
         tokens = lines[ind].partition('|')
-        ten_patterns = [set(digit) for digit in tokens[0].split()]
+        ten_patterns = [convert(digit) for digit in tokens[0].split()]
         if tokens[-1]:
-            four_patterns = [set(digit) for digit in tokens[-1].split()]
+            four_patterns = [convert(digit) for digit in tokens[-1].split()]
         else:
             ind += 1
-            four_patterns = [set(digit) for digit in lines[ind].split()]
+            four_patterns = [convert(digit) for digit in lines[ind].split()]
         ind += 1
         ten_patterns_list.append(ten_patterns)
         four_patterns_list.append(four_patterns)
     return ten_patterns_list, four_patterns_list
 
 
+def pattern_to_mask(pattern):
+    """Convert a string of segment letters to a 7-bit int mask."""
+    mask = 0
+    for char in pattern:
+        mask |= 1 << (ord(char) - ord('a'))
+    return mask
+
+
 def day08a(input_path):
     _, four_patterns_list = load_input(input_path)
 
@@ -97,8 +114,130 @@ def test08b():
     assert 61229 == day08b('test_input.txt')
 
 
+@functools.lru_cache(maxsize=None)
+def solve_wiring(signature):
+    """Return dictionary mapping each of the ten masks to its digit.
+
+    This is the same logic as resolve, but with masks, so a pattern is a subset
+    of another when masking it with the other leaves it unchanged. The
+    signature is the sorted tuple of the ten masks, so any displays that share
+    a wiring only get solved once.
+    """
+    by_count = sorted(signature, key=int.bit_count)
+    one, seven, four, eight = by_count[0], by_count[1], by_count[2], by_count[-1]
+    digit_map = {one: 1, seven: 7, four: 4, eight: 8}
+    nine = None
+    for mask in by_count[6:9]:
+        if mask & four == four:
+            digit_map[mask] = 9
+            nine = mask
+        elif mask & seven == seven:
+            digit_map[mask] = 0
+        else:
+            digit_map[mask] = 6
+    for mask in by_count[3:6]:
+        if mask & seven == seven:
+            digit_map[mask] = 3
+        elif mask & nine == mask:
+            digit_map[mask] = 5
+        else:
+            digit_map[mask] = 2
+    assert len(digit_map) == 10
+    return digit_map
+
+
+def resolve_masks(ten_masks, four_masks):
+    """Return the four-digit output value of a display given as masks."""
+    digit_map = solve_wiring(tuple(sorted(ten_masks)))
+    total = 0
+    for mask in four_masks:
+        total = 10 * total + digit_map[mask]
+    return total
+
+
+def day08b_masks(input_path):
+    ten_masks_list, four_masks_list = load_input(input_path, as_masks=True)
+    return sum(resolve_masks(ten_masks, four_masks)
+               for ten_masks, four_masks in zip(ten_masks_list, four_masks_list))
+
+
+# segments lit for each digit with the standard wiring
+DIGIT_SEGMENTS = ['abcefg', 'cf', 'acdeg', 'acdfg', 'bcdf',
+                  'abdfg', 'abdefg', 'acf', 'abcdefg', 'abcdfg']
+
+
+def get_mask_sets(masks):
+    """Return tuple (lo, hi) of uint64 arrays, which together hold a 128-bit
+    set of the masks in each row of an n x m array of 7-bit masks."""
+    masks = masks.astype(np.uint64)
+    one = np.uint64(1)
+    lo = np.bitwise_or.reduce(np.where(masks < 64, one << (masks % 64), 0), axis=1)
+    hi = np.bitwise_or.reduce(np.where(masks >= 64, one << (masks % 64), 0), axis=1)
+    return lo.astype(np.uint64), hi.astype(np.uint64)
+
+
+def get_set_keys(lo, hi):
+    """Mix the two halves of 128-bit mask sets into one uint64 key."""
+    return lo ^ (hi * np.uint64(0x9E3779B97F4A7C15))
+
+
+@functools.lru_cache(maxsize=None)
+def get_wiring_tables():
+    """Return tuple (keys, lo, hi, digit_table) for all 5040 wirings, sorted by
+    key.
+
+    Each wiring is a permutation of the seven segments. Its ten digit masks
+    make up a set that identifies it, and digit_table maps each of its masks
+    back to the digit (and everything else to -1).
+    """
+    perms = np.array(list(itertools.permutations(range(7))), dtype=np.int64)
+    digit_bits = np.array([[char in segments for char in 'abcdefg']
+                           for segments in DIGIT_SEGMENTS], dtype=np.int64)
+    digit_masks = (1 << perms) @ digit_bits.T
+    lo, hi = get_mask_sets(digit_masks)
+    keys = get_set_keys(lo, hi)
+    order = np.argsort(keys)
+    assert len(np.unique(keys)) == len(keys)
+    digit_table = np.full((len(perms), 128), -1, dtype=np.int8)
+    digit_table[np.arange(len(perms))[:, None], digit_masks] = np.arange(10)
+    return keys[order], lo[order], hi[order], digit_table[order]
+
+
+def decode_displays(ten_masks, four_masks):
+    """Return the output values for n displays given as an n x 10 array of
+    pattern masks and an n x 4 array of output masks.
+
+    Look up each display's wiring among all possible wirings by its set of ten
+    masks, and then decode all of the outputs with one table lookup.
+    """
+    keys, all_lo, all_hi, digit_table = get_wiring_tables()
+    lo, hi = get_mask_sets(np.asarray(ten_masks))
+    inds = np.minimum(np.searchsorted(keys, get_set_keys(lo, hi)), len(keys) - 1)
+    if np.any(all_lo[inds] != lo) or np.any(all_hi[inds] != hi):
+        raise RuntimeError('Display patterns do not match any wiring')
+    digits = digit_table[inds[:, None], np.asarray(four_masks)]
+    if np.any(digits < 0):
+        raise RuntimeError('Display output does not match its wiring')
+    return digits.astype(np.int64) @ np.array([1000, 100, 10, 1])
+
+
+def day08b_vectorized(input_path):
+    ten_masks_list, four_masks_list = load_input(input_path, as_masks=True)
+    return int(np.sum(decode_displays(ten_masks_list, four_masks_list)))
+
+
+def test08_masks():
+    ten_masks_list, four_masks_list = load_input('test_input0.txt', as_masks=True)
+    assert ten_masks_list[0][0] == pattern_to_mask('gfbdace')
+    assert 5353 == resolve_masks(ten_masks_list[0], four_masks_list[0])
+    assert [5353] == decode_displays(ten_masks_list, four_masks_list).tolist()
+    assert 61229 == day08b_masks('test_input.txt')
+    assert 61229 == day08b_vectorized('test_input.txt')
+
+
 if __name__ == '__main__':
     test08a()
     print('Day 08a:', day08a('day08_input.txt'))
     test08b()
     print('Day 08b:', day08b('day08_input.txt'))
+    test08_masks()
@@ -1,3 +1,5 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 
@@ -16,7 +18,20 @@ def get_low_points_mask(height_array):
 
     Array shape is the same as height array, and a value of True indicates a
     low point.
+
+    Pad the heights with a value higher than any height, so that cells on the
+    edges don't need special handling, and compare every cell to its four
+    neighbors with shifted views of the padded array.
     """
+    sentinel = np.max(height_array) + 1 if height_array.size else 0
+    padded = np.pad(height_array, 1, constant_values=sentinel)
+    center = padded[1:-1, 1:-1]
+    return (center < padded[:-2, 1:-1]) & (center < padded[2:, 1:-1]) & \
+        (center < padded[1:-1, :-2]) & (center < padded[1:-1, 2:])
+
+
+def get_low_points_mask_loop(height_array):
+    """Return the same thing as get_low_points_mask, one cell at a time."""
     n_rows, n_cols = height_array.shape
     lowest = np.zeros_like(height_array, dtype=bool)
     for irow in range(n_rows):
@@ -47,6 +62,9 @@ def day09a(input_path):
 
 
 def test09a():
+    height_array = load_input('test_input.txt')
+    assert np.array_equal(get_low_points_mask(height_array),
+                          get_low_points_mask_loop(height_array))
     score = day09a('test_input.txt')
     assert 15 == score
 
@@ -54,51 +72,190 @@ def test09a():
 def day09b(input_path):
     """Return the product of the three largest basin sizes."""
     height_array = load_input(input_path)
-    lowest = get_low_points_mask(height_array)
+    labels, n_basins = label_basins(height_array)
+    basin_sizes = np.bincount(labels.ravel(), minlength=n_basins + 1)[1:]
+    return np.prod(get_largest(basin_sizes, 3))
+
 
-    # for each low point, get the size of the corresponding basin
-    basin_sizes = []
-    lowest_inds = np.where(lowest)
-    for irow, icol in zip(*lowest_inds):
-        basin = np.zeros_like(height_array, dtype=bool)
-        basin[irow, icol] = True
-        update_basin(basin, height_array, irow, icol)
-        basin_sizes.append(np.sum(basin))
+def get_largest(vals, count):
+    """Return the largest count values (in no particular order)."""
+    if len(vals) <= count:
+        return vals
+    return np.partition(vals, -count)[-count:]
 
-    basin_sizes = np.sort(basin_sizes)
-    return np.prod(basin_sizes[-3:])
 
+def label_basins(height_array):
+    """Return tuple (labels, n_basins), where labels is an int array of the same
+    shape as height array with basin ids from 1 to n_basins, and 0 for points of
+    height 9.
 
-def update_basin(basin, height_array, irow, icol):
-    """For a point in a basin, check to see if neighboring points have height 9,
-    and expand the basin if they are lower than 9.
+    Basins are the connected areas of points lower than 9. First give every
+    horizontal run of basin points its own label, which is just a cumulative
+    sum of run starts in raster order. Then merge the labels of runs that touch
+    between one row and the next with union-find.
     """
-    n_rows, n_cols = height_array.shape
-    if irow > 0 and not basin[irow - 1, icol]:
-        if height_array[irow - 1, icol] < 9:
-            basin[irow - 1, icol] = True
-            update_basin(basin, height_array, irow - 1, icol)
-    if icol > 0 and not basin[irow, icol - 1]:
-        if height_array[irow, icol - 1] < 9:
-            basin[irow, icol - 1] = True
-            update_basin(basin, height_array, irow, icol - 1)
-    if irow < n_rows - 1 and not basin[irow + 1, icol]:
-        if height_array[irow + 1, icol] < 9:
-            basin[irow + 1, icol] = True
-            update_basin(basin, height_array, irow + 1, icol)
-    if icol < n_cols - 1 and not basin[irow, icol + 1]:
-        if height_array[irow, icol + 1] < 9:
-            basin[irow, icol + 1] = True
-            update_basin(basin, height_array, irow, icol + 1)
+    in_basin = height_array < 9
+    n_rows, n_cols = in_basin.shape
+    run_starts = in_basin.copy()
+    run_starts[:, 1:] &= ~in_basin[:, :-1]
+    run_labels = np.cumsum(run_starts.ravel()).reshape(in_basin.shape) * in_basin
+    n_runs = int(run_labels.max()) if run_labels.size else 0
+
+    touching = in_basin[:-1] & in_basin[1:]
+    roots = find_roots(n_runs + 1, run_labels[:-1][touching], run_labels[1:][touching])
+    # renumber roots so that basin ids go from 1 to n_basins
+    root_ids, labels = np.unique(roots[run_labels], return_inverse=True)
+    labels = labels.reshape(in_basin.shape)
+    if root_ids[0] != 0:
+        labels += 1
+    return labels, int(np.count_nonzero(root_ids))
+
+
+def find_roots(n_labels, labels1, labels2):
+    """Return an array giving the root label (the smallest label it's connected
+    to) for every label from 0 to n_labels - 1, where each labels1[i] is
+    connected to labels2[i].
+
+    This is union-find done for all connections at once. Each round hooks the
+    larger root of every connection onto the smaller one, and then jumps
+    pointers until every label points straight at its root. Repeat until all
+    connected labels share a root.
+    """
+    parent = np.arange(n_labels)
+    labels1 = np.asarray(labels1)
+    labels2 = np.asarray(labels2)
+    while True:
+        roots1 = parent[labels1]
+        roots2 = parent[labels2]
+        differ = roots1 != roots2
+        if not np.any(differ):
+            return parent
+        roots1 = roots1[differ]
+        roots2 = roots2[differ]
+        np.minimum.at(parent, np.maximum(roots1, roots2), np.minimum(roots1, roots2))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
 
 
 def test09b():
+    labels, n_basins = label_basins(load_input('test_input.txt'))
+    assert n_basins == 4
+    assert sorted(np.bincount(labels.ravel())[1:]) == [3, 9, 9, 14]
     score = day09b('test_input.txt')
     assert 1134 == score
 
 
+def load_memmap(input_path):
+    """Return a 2D memory-mapped view of the digit characters in the input file,
+    without reading the file into memory.
+
+    All rows need to be the same length. The view skips over the line endings,
+    and it works whether or not the last line has one.
+    """
+    with open(input_path, 'rb') as file_obj:
+        first_line = file_obj.readline()
+    n_cols = len(first_line.rstrip(b'\r\n'))
+    row_stride = len(first_line)
+    flat = np.memmap(input_path, dtype=np.uint8, mode='r')
+    n_rows = (len(flat) + row_stride - n_cols) // row_stride
+    return np.lib.stride_tricks.as_strided(
+        flat, shape=(n_rows, n_cols), strides=(row_stride, 1), writeable=False)
+
+
+def process_tile(args):
+    """Find the low points and the basins within one tile of the height map.
+
+    Tile bounds are [row0, row1) and [col0, col1). The tile is read with a
+    one-point halo (where there's anything around it), so that low points on
+    the tile edges are compared to their neighbors in the next tile. Basins are
+    labeled within the tile only, and the labels along the tile edges are
+    returned so that basins can be merged with the neighboring tiles.
+
+    Return tuple (risk_level, basin_sizes, edges), where edges holds the labels
+    on the top, bottom, left, and right edges of the tile.
+    """
+    input_path, row0, row1, col0, col1 = args
+    chars = load_memmap(input_path)
+    n_rows, n_cols = chars.shape
+    halo_row0 = max(row0 - 1, 0)
+    halo_col0 = max(col0 - 1, 0)
+    block = chars[halo_row0:min(row1 + 1, n_rows), halo_col0:min(col1 + 1, n_cols)]
+    block = block.astype(np.int8) - ord('0')
+    tile = block[row0 - halo_row0:row1 - halo_row0, col0 - halo_col0:col1 - halo_col0]
+    lowest = get_low_points_mask(block)[row0 - halo_row0:row1 - halo_row0,
+                                        col0 - halo_col0:col1 - halo_col0]
+    risk_level = int(np.sum(tile[lowest], dtype=np.int64)) + int(np.sum(lowest))
+
+    labels, n_basins = label_basins(tile)
+    basin_sizes = np.bincount(labels.ravel(), minlength=n_basins + 1)[1:]
+    edges = (labels[0], labels[-1], labels[:, 0], labels[:, -1])
+    return risk_level, basin_sizes, edges
+
+
+def day09_tiled(input_path, tile_size=1024, n_workers=1):
+    """Return tuple (risk_level, basin_product) with the answers to parts a and
+    b, for height maps that don't fit in memory.
+
+    The height map is memory-mapped and handled in square tiles (spread over
+    n_workers processes), so only a few tiles are ever in memory at once. Basin
+    labels from each tile get their own range of global ids, and ids of basin
+    points that touch across tile edges are merged with union-find.
+    """
+    n_rows, n_cols = load_memmap(input_path).shape
+    row_starts = list(range(0, n_rows, tile_size))
+    col_starts = list(range(0, n_cols, tile_size))
+    tile_args = [(input_path, row0, min(row0 + tile_size, n_rows),
+                  col0, min(col0 + tile_size, n_cols))
+                 for row0 in row_starts for col0 in col_starts]
+    if n_workers == 1:
+        results = list(map(process_tile, tile_args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(process_tile, tile_args, chunksize=4))
+
+    risk_level = sum(result[0] for result in results)
+    # global id of a tile's basin is its local label plus the tile's offset
+    n_basins = [len(result[1]) for result in results]
+    offsets = np.concatenate([[0], np.cumsum(n_basins)[:-1]]).astype(np.int64)
+    all_sizes = np.concatenate([[0]] + [result[1] for result in results]).astype(np.int64)
+
+    def to_global(labels, offset):
+        return np.where(labels > 0, labels + offset, 0)
+
+    labels1 = [np.zeros(0, dtype=np.int64)]
+    labels2 = [np.zeros(0, dtype=np.int64)]
+    n_tile_cols = len(col_starts)
+    for ind, (_, _, (top, bottom, left, right)) in enumerate(results):
+        neighbors = []
+        if (ind + 1) % n_tile_cols:
+            neighbors.append((right, ind + 1, 2))
+        if ind + n_tile_cols < len(results):
+            neighbors.append((bottom, ind + n_tile_cols, 0))
+        for edge, other_ind, other_edge_ind in neighbors:
+            edge = to_global(edge, offsets[ind])
+            other_edge = to_global(results[other_ind][2][other_edge_ind], offsets[other_ind])
+            touching = (edge > 0) & (other_edge > 0)
+            labels1.append(edge[touching])
+            labels2.append(other_edge[touching])
+    roots = find_roots(len(all_sizes), np.concatenate(labels1), np.concatenate(labels2))
+    basin_sizes = np.zeros(len(all_sizes), dtype=np.int64)
+    np.add.at(basin_sizes, roots, all_sizes)
+    basin_sizes = basin_sizes[1:][basin_sizes[1:] > 0]
+    return risk_level, int(np.prod(get_largest(basin_sizes, 3)))
+
+
+def test09_tiled():
+    for tile_size in [1, 2, 3, 4, 100]:
+        assert (15, 1134) == day09_tiled('test_input.txt', tile_size=tile_size)
+    assert (15, 1134) == day09_tiled('test_input.txt', tile_size=3, n_workers=2)
+
+
 if __name__ == '__main__':
     test09a()
     print('Day 09a:', day09a('day09_input.txt'))
     test09b()
     print('Day 09b:', day09b('day09_input.txt'))
+    test09_tiled()
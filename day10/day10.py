@@ -1,5 +1,18 @@
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
+import tempfile
+
 import numpy as np
 
+# bracket characters are translated to small ints: 1 to 4 for the openers and
+# 5 to 8 for the matching closers, in the same order as the completion points
+BRACKET_TABLE = bytes.maketrans(b'([{<)]}>', bytes(range(1, 9)))
+# syntax error points for each closer code
+CORRUPT_POINTS = [0, 0, 0, 0, 0, 3, 57, 1197, 25137]
+# number of bytes of the file for each worker to check at a time
+CHUNK_SIZE = 1 << 24
+
 
 def day10a(input_path):
     """Calculate and return the total syntax error score."""
@@ -100,8 +113,194 @@ def test10b():
     assert 288957 == day10b('test_input.txt')
 
 
+def check_bytes(data):
+    """Check every line in a bytes buffer for corrupt characters and
+    incompleteness.
+
+    Return tuple (syntax_score, completion_scores), where syntax_score is the
+    total for all corrupt lines, and completion_scores is a list of scores for
+    the incomplete lines, in order.
+    """
+    lines = data.translate(BRACKET_TABLE).split()
+    stack = [0] * max((len(line) for line in lines), default=0)
+    syntax_score = 0
+    completion_scores = []
+    for line in lines:
+        depth = 0
+        for code in line:
+            if code <= 4:
+                stack[depth] = code
+                depth += 1
+            elif code <= 8:
+                depth -= 1
+                if depth < 0 or stack[depth] != code - 4:
+                    syntax_score += CORRUPT_POINTS[code]
+                    break
+            else:
+                raise RuntimeError(f'Unexpected character {chr(code)}')
+        else:
+            if depth:
+                total = 0
+                for ind in range(depth - 1, -1, -1):
+                    total = 5 * total + stack[ind]
+                completion_scores.append(total)
+    return syntax_score, completion_scores
+
+
+def get_chunk_bounds(input_path, chunk_size=CHUNK_SIZE):
+    """Split the input file into (start, end) byte ranges of roughly chunk_size
+    bytes that each begin and end on a line boundary."""
+    size = os.path.getsize(input_path)
+    offsets = [0]
+    with open(input_path, 'rb') as file_obj:
+        while offsets[-1] < size:
+            file_obj.seek(offsets[-1] + chunk_size)
+            file_obj.readline()
+            offsets.append(min(file_obj.tell(), size))
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def check_chunk(args):
+    """Run check_bytes on one (input_path, start, end) chunk of the file."""
+    input_path, start, end = args
+    with open(input_path, 'rb') as file_obj:
+        file_obj.seek(start)
+        return check_bytes(file_obj.read(end - start))
+
+
+def check_file(input_path, n_workers=1, chunk_size=CHUNK_SIZE):
+    """Return tuple (syntax_score, completion_scores) for the whole file, read
+    in one pass and split by lines across n_workers processes."""
+    chunk_args = [(input_path, start, end)
+                  for start, end in get_chunk_bounds(input_path, chunk_size)]
+    if n_workers == 1:
+        results = map(check_chunk, chunk_args)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(check_chunk, chunk_args))
+    syntax_score = 0
+    completion_scores = []
+    for chunk_score, chunk_completion_scores in results:
+        syntax_score += chunk_score
+        completion_scores.extend(chunk_completion_scores)
+    return syntax_score, completion_scores
+
+
+def day10_bulk(input_path, n_workers=1, chunk_size=CHUNK_SIZE):
+    """Return tuple (syntax_score, middle_score) with the answers to both parts
+    from a single pass through the file."""
+    syntax_score, completion_scores = check_file(input_path, n_workers, chunk_size)
+    return syntax_score, get_middle(completion_scores)
+
+
+def get_middle(scores):
+    """Return the middle score (the upper one, for an even number of scores)
+    with a selection instead of a full sort.
+
+    Scores that are too big for int64 fall back to sorting python ints. With no
+    scores at all there's no middle, so return None, like RunningMedian does.
+    """
+    if not scores:
+        return None
+    middle = len(scores) // 2
+    if max(scores) < 2**63:
+        return int(np.partition(np.array(scores, dtype=np.int64), middle)[middle])
+    return sorted(scores)[middle]
+
+
+class RunningMedian:
+    """Keep track of the middle value of a stream of values with two heaps.
+
+    The low heap (stored negated, so that it's a max heap) holds the smaller
+    half of the values, and the high heap holds the rest, which is the same
+    size or one more. The middle value is then the smallest of the high heap.
+    """
+
+    def __init__(self):
+        self.low = []
+        self.high = []
+
+    def __len__(self):
+        return len(self.low) + len(self.high)
+
+    def add(self, val):
+        if self.high and val < self.high[0]:
+            heapq.heappush(self.low, -val)
+        else:
+            heapq.heappush(self.high, val)
+        if len(self.high) > len(self.low) + 1:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+        elif len(self.low) > len(self.high):
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+
+    @property
+    def median(self):
+        """Return the middle value, matching sorted(values)[len(values) // 2]."""
+        return self.high[0] if self.high else None
+
+
+def iter_running_median(input_path, chunk_size=CHUNK_SIZE):
+    """Check the file one chunk at a time, and after each chunk, yield tuple
+    (n_incomplete, median) with the number of incomplete lines so far and the
+    middle completion score so far."""
+    running = RunningMedian()
+    for start, end in get_chunk_bounds(input_path, chunk_size):
+        _, completion_scores = check_chunk((input_path, start, end))
+        for score in completion_scores:
+            running.add(score)
+        yield len(running), running.median
+
+
+def day10b_streaming(input_path, chunk_size=CHUNK_SIZE):
+    """Calculate and return the middle completion score by feeding the scores
+    into a running median one chunk at a time (see iter_running_median for the
+    median after each chunk). The running median still keeps every score, so
+    this saves holding on to the lines, not the scores."""
+    median = None
+    for _, median in iter_running_median(input_path, chunk_size):
+        pass
+    return median
+
+
+def test10_bulk():
+    syntax_score, completion_scores = check_bytes(b'{([(<{}[<>[]}>{[]{[(<()>\n<{([\n')
+    assert syntax_score == 1197
+    assert completion_scores == [294]
+    assert (26397, 288957) == day10_bulk('test_input.txt')
+    assert (26397, 288957) == day10_bulk('test_input.txt', n_workers=2, chunk_size=50)
+
+
+def test10_streaming():
+    running = RunningMedian()
+    for val in [5, 1, 4, 2, 3]:
+        running.add(val)
+    assert running.median == 3
+    running.add(10)
+    assert running.median == 4
+    assert 288957 == get_middle([288957, 5566, 1480781, 995444, 294])
+    assert [(3, 288957), (5, 288957)] == \
+        list(iter_running_median('test_input.txt', chunk_size=100))
+    assert 288957 == day10b_streaming('test_input.txt', chunk_size=50)
+
+
+def test10_empty():
+    # no incomplete lines means no middle score, from either path
+    assert get_middle([]) is None
+    assert (0, []) == check_bytes(b'()\n[<>]\n')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 'complete.txt')
+        with open(input_path, 'wb') as file_obj:
+            file_obj.write(b'()\n[<>]\n')
+        assert (0, None) == day10_bulk(input_path)
+        assert (0, None) == day10_bulk(input_path, n_workers=2, chunk_size=4)
+        assert day10b_streaming(input_path) is None
+
+
 if __name__ == '__main__':
     test10a()
     print('Day 10a:', day10a('day10_input.txt'))
     test10b()
     print('Day 10b:', day10b('day10_input.txt'))
+    test10_bulk()
+    test10_streaming()
+    test10_empty()
@@ -1,5 +1,7 @@
 import numpy as np
 
+from octopus import OctopusGrid, simulate_batch
+
 
 def load_input(input_path):
     """Load and return 2D numpy array of octopus energy levels."""
@@ -12,47 +14,8 @@ def load_input(input_path):
 
 def day11a(input_path):
     """Calculate and return the total number of flashes over 100 steps."""
-    levels = load_input(input_path)
-    total_flashes = 0
-    for _ in range(100):
-        # at each step, energy for each octopus increases by 1
-        levels += 1
-        # any octopi with energy > 9 will flash
-        inds = levels > 9
-        # each flash increases energy of neighboring octopi by 1, so iteratively
-        # increase energy based on flashes, check which new octopi will flash,
-        # etc. until no new flashes are found.
-        new_inds = inds.copy()
-        while np.any(new_inds):
-            coords = np.where(new_inds)
-            for y, x in zip(*coords):
-                if y > 0:
-                    levels[y-1, x] += 1
-                if x > 0:
-                    levels[y, x-1] += 1
-                if y > 0 and x > 0:
-                    levels[y-1, x-1] += 1
-                if y < levels.shape[0] - 1:
-                    levels[y+1, x] += 1
-                if x < levels.shape[1] - 1:
-                    levels[y, x+1] += 1
-                if y < levels.shape[0] - 1 and x < levels.shape[1] - 1:
-                    levels[y+1, x+1] += 1
-                if y > 0 and x < levels.shape[1] - 1:
-                    levels[y-1, x+1] += 1
-                if y < levels.shape[0] - 1 and x > 0:
-                    levels[y+1, x-1] += 1
-            # octopi flash at most once per step, so any we've already flagged
-            # don't count as new flashes
-            new_inds = (levels > 9) & np.logical_not(inds)
-            inds = inds | new_inds
-        flashes = np.sum(inds)
-        # energy resets to 0 after a flash
-        levels[inds] = 0
-
-        total_flashes += flashes
-
-    return total_flashes
+    grid = OctopusGrid(load_input(input_path))
+    return sum(grid.iter_steps(100))
 
 
 def test11a():
@@ -61,56 +24,67 @@ def test11a():
 
 def day11b(input_path):
     """Return the first step at which all octopi flash."""
-    levels = load_input(input_path)
-
-    step = 0
-    while True:
-        step += 1
-        # at each step, energy for each octopus increases by 1
-        levels += 1
-        # any octopi with energy > 9 will flash
-        inds = levels > 9
-        # each flash increases energy of neighboring octopi by 1, so iteratively
-        # increase energy based on flashes, check which new octopi will flash,
-        # etc. until no new flashes are found.
-        new_inds = inds.copy()
-        while np.any(new_inds):
-            coords = np.where(new_inds)
-            for y, x in zip(*coords):
-                if y > 0:
-                    levels[y-1, x] += 1
-                if x > 0:
-                    levels[y, x-1] += 1
-                if y > 0 and x > 0:
-                    levels[y-1, x-1] += 1
-                if y < levels.shape[0] - 1:
-                    levels[y+1, x] += 1
-                if x < levels.shape[1] - 1:
-                    levels[y, x+1] += 1
-                if y < levels.shape[0] - 1 and x < levels.shape[1] - 1:
-                    levels[y+1, x+1] += 1
-                if y > 0 and x < levels.shape[1] - 1:
-                    levels[y-1, x+1] += 1
-                if y < levels.shape[0] - 1 and x > 0:
-                    levels[y+1, x-1] += 1
-            # octopi flash at most once per step, so any we've already flagged
-            # don't count as new flashes
-            new_inds = (levels > 9) & np.logical_not(inds)
-            inds = inds | new_inds
-        flashes = np.sum(inds)
-        # energy resets to 0 after a flash
-        levels[inds] = 0
-
-        if flashes == levels.size:
-            return step
+    grid = OctopusGrid(load_input(input_path))
+    for flashes in grid.iter_steps():
+        if flashes == grid.levels.size:
+            return grid.n_steps
 
 
 def test11b():
     assert 195 == day11b('test_input.txt')
 
 
+def day11_batch(input_paths, n_steps=100, max_steps=None):
+    """Return tuple (total_flashes, first_sync) of arrays with the answers to
+    both parts for every input file, simulated together in one batch."""
+    levels = np.stack([load_input(input_path) for input_path in input_paths])
+    return simulate_batch(levels, n_steps, max_steps)
+
+
+def test11_batch():
+    levels = load_input('test_input.txt')
+    # a grid of all zeros first flashes all at once at step 10, and stopping at
+    # 50 steps is too soon for the test grid
+    batch = np.stack([levels, np.zeros_like(levels), levels])
+    total_flashes, first_sync = simulate_batch(batch, n_steps=10, max_steps=50)
+    assert total_flashes.tolist() == [204, 100, 204]
+    assert first_sync.tolist() == [-1, 10, -1]
+    # stopping the sync search early doesn't cut the flash count short
+    total_flashes, first_sync = simulate_batch(levels[None], n_steps=100, max_steps=50)
+    assert total_flashes.tolist() == [1656]
+    assert first_sync.tolist() == [-1]
+    total_flashes, first_sync = day11_batch(['test_input.txt'] * 3)
+    assert total_flashes.tolist() == [1656] * 3
+    assert first_sync.tolist() == [195] * 3
+
+
+def day11_long(input_path, n_steps):
+    """Return tuple (total_flashes, first_sync) with the total number of flashes
+    after any number of steps, and the first step at which all octopi flash
+    (or None if they never will), by finding where the grid starts repeating.
+    """
+    cycle = OctopusGrid(load_input(input_path)).find_cycle()
+    return cycle.flashes_after(n_steps), cycle.first_sync()
+
+
+def test11_long():
+    cycle = OctopusGrid(load_input('test_input.txt')).find_cycle()
+    # once everything flashes together, the grid repeats every 10 steps
+    assert (cycle.start, cycle.length) == (195, 10)
+    assert 1656 == cycle.flashes_after(100)
+    grid = OctopusGrid(load_input('test_input.txt'))
+    assert sum(grid.iter_steps(1000)) == cycle.flashes_after(1000)
+    total_flashes, first_sync = day11_long('test_input.txt', 10**12)
+    assert first_sync == 195
+    assert total_flashes == cycle.flashes_after(195) + (10**12 - 195) // 10 * 100
+    # a single octopus with nothing to set it off
+    assert OctopusGrid(np.zeros((1, 1), dtype=int)).find_cycle().first_sync() == 10
+
+
 if __name__ == '__main__':
     test11a()
     print('Day 11a:', day11a('day11_input.txt'))
     test11b()
     print('Day 11b:', day11b('day11_input.txt'))
+    test11_batch()
+    test11_long()
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+def count_flashing_neighbors(flashing):
+    """Return, for every octopus, the number of its 8 neighbors that are flashing.
+
+    The grid is in the last two axes of the boolean flashing array. Pad the
+    grid with a border of non-flashing octopi, and then add up the 8 shifted
+    views of the padded grid.
+    """
+    pad_width = [(0, 0)] * (flashing.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(flashing.astype(np.int8), pad_width)
+    n_rows, n_cols = flashing.shape[-2:]
+    counts = np.zeros(flashing.shape, dtype=np.int8)
+    for drow in range(3):
+        for dcol in range(3):
+            if drow == 1 and dcol == 1:
+                continue
+            counts += padded[..., drow:drow + n_rows, dcol:dcol + n_cols]
+    return counts
+
+
+def advance(levels):
+    """Advance the energy levels (in place) by one step, and return a boolean
+    array of the octopi that flashed.
+
+    The grid is in the last two axes, so levels can hold any number of grids.
+    """
+    # at each step, energy for each octopus increases by 1
+    levels += 1
+    # any octopi with energy > 9 will flash
+    flashed = levels > 9
+    # each flash increases energy of neighboring octopi by 1, so add up the
+    # increases from the whole wave of new flashes at once, check which new
+    # octopi will flash, etc. until no new flashes are found.
+    new_flashes = flashed
+    while np.any(new_flashes):
+        levels += count_flashing_neighbors(new_flashes)
+        # octopi flash at most once per step, so any we've already flagged
+        # don't count as new flashes
+        new_flashes = (levels > 9) & ~flashed
+        flashed = flashed | new_flashes
+    # energy resets to 0 after a flash
+    levels[flashed] = 0
+    return flashed
+
+
+def simulate_batch(levels, n_steps=100, max_steps=None):
+    """Simulate a batch of grids all at once.
+
+    :param levels: N x H x W array of energy levels for N grids
+    :param n_steps: number of steps to count flashes for
+    :param max_steps: optional maximum number of steps to look for a step where
+        a whole grid flashes at once; if None, keep going until every grid has
+        had one, which may be forever
+    :return: tuple (total_flashes, first_sync), with the total number of
+        flashes over n_steps and the first step where all octopi flashed at once
+        (or -1 if that didn't happen within max_steps) for each grid
+
+    Grids drop out of the batch once they're done with both (or once both
+    n_steps and max_steps have passed), so the rest of the batch doesn't keep
+    paying for them.
+    """
+    levels = np.array(levels, dtype=np.int64)
+    n_grids = levels.shape[0]
+    grid_size = levels.shape[1] * levels.shape[2]
+    total_flashes = np.zeros(n_grids, dtype=np.int64)
+    first_sync = np.full(n_grids, -1, dtype=np.int64)
+    grid_ids = np.arange(n_grids)
+    step = 0
+    # keep going for n_steps no matter what, since we need all the flashes up to
+    # there, and only stop looking for a sync step at max_steps
+    while len(grid_ids):
+        step += 1
+        flashes = np.sum(advance(levels), axis=(1, 2))
+        if step <= n_steps:
+            total_flashes[grid_ids] += flashes
+        if max_steps is None or step <= max_steps:
+            synced = (flashes == grid_size) & (first_sync[grid_ids] < 0)
+            first_sync[grid_ids[synced]] = step
+        if step >= n_steps:
+            keep = first_sync[grid_ids] < 0
+            if max_steps is not None and step >= max_steps:
+                keep[:] = False
+            if not np.all(keep):
+                levels = levels[keep]
+                grid_ids = grid_ids[keep]
+    return total_flashes, first_sync
+
+
+class OctopusGrid:
+
+    def __init__(self, levels):
+        """Initialize OctopusGrid.
+
+        :param levels: 2D array of octopus energy levels; it's copied, so the
+            original array isn't changed by stepping
+        """
+        self.levels = np.array(levels, dtype=np.int64)
+        self.n_steps = 0
+
+    def step(self):
+        """Advance one step and return the number of octopi that flashed."""
+        flashed = advance(self.levels)
+        self.n_steps += 1
+        return int(np.sum(flashed))
+
+    def iter_steps(self, max_steps=None):
+        """Step until max_steps (or forever if None), yielding the number of
+        flashes at each step."""
+        while max_steps is None or self.n_steps < max_steps:
+            yield self.step()
+
+    def find_cycle(self, max_steps=None):
+        """Step until the energy levels repeat a state they've been in before.
+
+        Stepping only depends on the current levels, so once a state repeats,
+        everything after it repeats too. Keep an index from each state (as
+        bytes) to the step it was seen at to spot the first repeat. Levels are
+        always 0 to 9 after a step, so the states are stored as uint8 to keep
+        the index small.
+
+        :param max_steps: optional maximum number of steps to look for a cycle;
+            if None, keep going until one is found (there are finitely many
+            states, so there always is one eventually)
+        :return: OctopusCycle, counted from the state when this was called
+        """
+        seen = {self.levels.astype(np.uint8).tobytes(): 0}
+        cumulative_flashes = [0]
+        for flashes in self.iter_steps():
+            step = len(cumulative_flashes)
+            cumulative_flashes.append(cumulative_flashes[-1] + flashes)
+            state = self.levels.astype(np.uint8).tobytes()
+            if state in seen:
+                return OctopusCycle(seen[state], step - seen[state],
+                                    cumulative_flashes, self.levels.size)
+            seen[state] = step
+            if max_steps is not None and step >= max_steps:
+                raise RuntimeError(f'No repeated state found in {max_steps} steps')
+
+
+class OctopusCycle:
+
+    def __init__(self, start, length, cumulative_flashes, grid_size):
+        """Initialize OctopusCycle.
+
+        :param start: step at which the state first enters the cycle
+        :param length: number of steps before the state repeats
+        :param cumulative_flashes: list of total flashes after each step, from 0
+            to start + length
+        :param grid_size: number of octopi in the grid
+        """
+        self.start = start
+        self.length = length
+        self.cumulative_flashes = cumulative_flashes
+        self.grid_size = grid_size
+
+    def flashes_after(self, n_steps):
+        """Return the total number of flashes after n steps, which can be as
+        many steps as we like, since every full cycle adds the same number."""
+        if n_steps < len(self.cumulative_flashes):
+            return self.cumulative_flashes[n_steps]
+        n_cycles, remainder = divmod(n_steps - self.start, self.length)
+        cycle_flashes = self.cumulative_flashes[self.start + self.length] - \
+            self.cumulative_flashes[self.start]
+        return self.cumulative_flashes[self.start + remainder] + n_cycles * cycle_flashes
+
+    def first_sync(self):
+        """Return the first step at which all octopi flash, or None if that can
+        never happen.
+
+        Every state there will ever be has been seen by the end of the first
+        cycle, so if no step up to there had every octopus flash, none ever will.
+        """
+        for step in range(1, len(self.cumulative_flashes)):
+            flashes = self.cumulative_flashes[step] - self.cumulative_flashes[step - 1]
+            if flashes == self.grid_size:
+                return step
+        return None
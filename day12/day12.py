@@ -1,5 +1,6 @@
 from collections import defaultdict
 import copy
+import functools
 
 
 def construct_cave_map(input_path):
@@ -83,8 +84,53 @@ def test12b():
     assert 36 == day12b('test_input.txt')
 
 
+def count_paths(cave_map, allow_double=False):
+    """Return the number of valid paths from 'start' to 'end' of the caves.
+
+    Small caves cannot be visited more than once, except that if allow_double
+    is True, one small cave can be visited twice.
+
+    Instead of copying sets of visited caves around, give every cave an int id
+    and keep track of the visited small caves as a bitmask. The number of paths
+    from a cave then only depends on (cave, visited mask, whether the double
+    visit is used up), so each of those only gets counted once.
+    """
+    names = sorted(set(cave_map) | {name for names in cave_map.values() for name in names})
+    ids = {name: ind for ind, name in enumerate(names)}
+    neighbors = [tuple(ids[name] for name in cave_map.get(node, [])) for node in names]
+    is_small = [ord(node[0]) >= 97 for node in names]
+    start = ids['start']
+    end = ids['end']
+
+    @functools.lru_cache(maxsize=None)
+    def explore_mask(node, visited, double_used):
+        if node == end:
+            return 1
+        valid_paths = 0
+        for next_node in neighbors[node]:
+            if next_node == start:
+                continue
+            if not is_small[next_node]:
+                valid_paths += explore_mask(next_node, visited, double_used)
+            elif not visited & (1 << next_node):
+                valid_paths += explore_mask(next_node, visited | (1 << next_node),
+                                            double_used)
+            elif not double_used:
+                valid_paths += explore_mask(next_node, visited, True)
+        return valid_paths
+
+    return explore_mask(start, 1 << start, not allow_double)
+
+
+def test12_count_paths():
+    cave_map = construct_cave_map('test_input.txt')
+    assert 10 == count_paths(cave_map)
+    assert 36 == count_paths(cave_map, allow_double=True)
+
+
 if __name__ == '__main__':
     test12a()
     print('Day 12a:', day12a('day12_input.txt'))
     test12b()
     print('Day 12b:', day12b('day12_input.txt'))
+    test12_count_paths()